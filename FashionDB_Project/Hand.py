@@ -2,15 +2,24 @@
 
 import streamlit as st
 import mysql.connector
-from mysql.connector import errorcode
+from mysql.connector import errorcode, pooling, HAVE_CEXT
 import pandas as pd
+import numpy as np
 import os
 from dotenv import load_dotenv
 import hashlib
-import binascii
-import os as pyos
+import hmac
+import secrets
 import matplotlib.pyplot as plt
 import datetime as _dt
+import io
+import csv
+import re
+from contextlib import contextmanager
+from collections import deque
+import threading
+import time
+import logging
 
 load_dotenv()
 
@@ -19,119 +28,547 @@ DB_CONFIG = {
     "user": os.getenv("DB_USER", "root"),
     "password": os.getenv("DB_PASS", ""),
     "database": os.getenv("DB_NAME", "fashion_business"),
-    "port": int(os.getenv("DB_PORT", "3306"))
+    "port": int(os.getenv("DB_PORT", "3306")),
+    # C extension decodes rows in C; fall back to the pure-Python driver only if it is missing
+    "use_pure": not HAVE_CEXT
 }
 
 # ---------------- DB helpers ----------------
-@st.cache_resource(ttl=600)
-def get_db_conn():
+def _make_pool(name, size):
+    return pooling.MySQLConnectionPool(
+        pool_name=name,
+        pool_size=size,
+        # keep sessions across borrows so server-side prepared statements survive
+        pool_reset_session=False,
+        # single-statement writes commit in the same round-trip; run_tx opens its own transaction
+        autocommit=True,
+        charset="utf8mb4",
+        use_unicode=True,
+        **DB_CONFIG
+    )
+
+@st.cache_resource
+def get_db_pool():
+    # page reruns
+    return _make_pool("fashiondb", int(os.getenv("DB_POOL_SIZE", "16")))
+
+@st.cache_resource
+def get_background_pool():
+    # audit-writer thread and deferred CSV exports (which hold a connection for the whole
+    # export), kept apart so they cannot starve page queries and vice versa
+    return _make_pool("fashiondb_bg", int(os.getenv("DB_BG_POOL_SIZE", "4")))
+
+POOL_RETRY_DELAYS = (0.05, 0.1, 0.2, 0.4)  # seconds; get_connection() never waits on its own
+
+def get_pooled_connection(pool):
+    """pool.get_connection(), retrying a short bounded backoff while the pool is exhausted.
+       Raises the last PoolError if no connection frees up."""
+    for delay in POOL_RETRY_DELAYS:
+        try:
+            return pool.get_connection()
+        except mysql.connector.errors.PoolError:
+            time.sleep(delay)
+    return pool.get_connection()
+
+@contextmanager
+def borrow_conn(pool=None):
+    """Borrow a connection from the pool (the page pool unless another is given); closing it
+       hands it back to the pool. Yields None if no connection could be obtained."""
+    cnx = None
     try:
-        cnx = mysql.connector.connect(**DB_CONFIG)
-        return cnx
+        cnx = get_pooled_connection(pool or get_db_pool())
     except mysql.connector.Error as err:
         st.error(f"DB connection error: {err}")
-        return None
-
-def run_query(query, params=None):
-    cnx = get_db_conn()
-    if not cnx:
-        return pd.DataFrame()
-    cur = cnx.cursor(dictionary=True)
     try:
-        cur.execute(query, params or ())
-        if cur.description:
+        yield cnx
+    finally:
+        if cnx:
+            cnx.close()
+
+@st.cache_resource
+def get_prepared_cursors():
+    return {}
+
+def prepared_cursor(cnx, query):
+    """Return a prepared cursor for `query` on this pooled connection, preparing it on first use.
+       The cursor only reuses its server-side statement when execute() receives the very
+       same string object, so the cached query string is returned alongside it."""
+    cache = get_prepared_cursors()
+    key = (cnx.connection_id, query)
+    if key not in cache:
+        cache[key] = (cnx.cursor(prepared=True), query)
+    return cache[key]
+
+def forget_prepared(cnx, query):
+    entry = get_prepared_cursors().pop((cnx.connection_id, query), None)
+    if entry:
+        try:
+            entry[0].close()
+        except Exception:
+            pass
+
+def run_prepared_query(query, params=None):
+    with borrow_conn() as cnx:
+        if not cnx:
+            return pd.DataFrame()
+        cur, stmt = prepared_cursor(cnx, query)
+        try:
+            cur.execute(stmt, params or ())
             cols = [c[0] for c in cur.description]
-            rows = cur.fetchall()
-            return pd.DataFrame(rows, columns=cols)
-        else:
+            return pd.DataFrame.from_records(cur.fetchall(), columns=cols)
+        except Exception as e:
+            st.error(f"Query error: {e}")
+            forget_prepared(cnx, query)
             return pd.DataFrame()
-    except Exception as e:
-        st.error(f"Query error: {e}")
-        return pd.DataFrame()
-    finally:
-        cur.close()
 
-def run_modification(query, params=None):
-    cnx = get_db_conn()
-    if not cnx:
-        st.error("No DB connection.")
-        return False
-    cur = cnx.cursor()
-    try:
-        cur.execute(query, params or ())
-        cnx.commit()
-        return True
-    except Exception as e:
-        st.error(f"Execution error: {e}")
+def run_prepared_modification(query, params=None):
+    with borrow_conn() as cnx:
+        if not cnx:
+            st.error("No DB connection.")
+            return False
+        cur, stmt = prepared_cursor(cnx, query)
         try:
-            cnx.rollback()
-        except:
-            pass
-        return False
-    finally:
-        cur.close()
+            cur.execute(stmt, params or ())
+            return True
+        except Exception as e:
+            st.error(f"Execution error: {e}")
+            forget_prepared(cnx, query)
+            try:
+                cnx.rollback()
+            except:
+                pass
+            return False
+
+# low-cardinality label columns returned by the joins below; stored as pandas categoricals
+CATEGORY_COLUMNS = {"store_name", "designer_name", "collection_name", "supplier_name", "role", "payment", "action", "table_name"}
+INT32 = np.iinfo(np.int32)
+
+def shrink_dtypes(df, categories=True):
+    """Store ids/quantities as int32 and floats as float32 where no value is lost, and known label
+       columns as categoricals, roughly halving frame memory and the Arrow payload sent to the browser.
+       DECIMAL columns arrive as Decimal objects and are left untouched. Columns are handled by
+       position, since ad-hoc joins (SQL Runner) can return duplicate column names."""
+    for i, dtype in enumerate(df.dtypes):
+        col = df.iloc[:, i]
+        if pd.api.types.is_integer_dtype(dtype):
+            if len(df) and col.min() >= INT32.min and col.max() <= INT32.max:
+                df.isetitem(i, col.astype('int32'))
+        elif pd.api.types.is_float_dtype(dtype):
+            df.isetitem(i, pd.to_numeric(col, downcast='float'))
+        elif categories and df.columns[i] in CATEGORY_COLUMNS and pd.api.types.is_string_dtype(dtype):
+            df.isetitem(i, col.astype('category'))
+    return df
+
+def run_query(query, params=None, read_only=False, raise_errors=False):
+    """Run a SELECT into a DataFrame (use run_query_stream for chunked reads).
+       With read_only=True the statement runs inside START TRANSACTION READ ONLY, so the
+       server rejects writes to tables (not file output such as SELECT ... INTO OUTFILE,
+       which is_read_only_sql screens out). By default a failure
+       is shown with st.error and yields an empty frame; raise_errors=True raises instead."""
+    with borrow_conn() as cnx:
+        if not cnx:
+            if raise_errors:
+                raise RuntimeError("No DB connection.")
+            return pd.DataFrame()
+        cur = cnx.cursor()
+        try:
+            if read_only:
+                cnx.start_transaction(readonly=True)
+            cur.execute(query, params or ())
+            if not cur.description:
+                return pd.DataFrame()
+            cols = [c[0] for c in cur.description]
+            df = pd.DataFrame.from_records(cur.fetchall(), columns=cols)
+        except Exception as e:
+            if raise_errors:
+                raise
+            st.error(f"Query error: {e}")
+            return pd.DataFrame()
+        finally:
+            if read_only:
+                try:
+                    if cnx.unread_result:
+                        cnx.consume_results()
+                    cnx.rollback()
+                except:
+                    pass
+            cur.close()
+    # outside the query's try, so a dtype problem can never be reported as a failed query
+    return shrink_dtypes(df)
+
+def run_query_stream(query, params=None, chunk=1000):
+    """Yield the result of a SELECT as DataFrames of at most `chunk` rows.
+       Uses an unbuffered cursor, so rows are pulled from the server as they
+       are consumed instead of being materialised in one go."""
+    for frame in _stream_frames(query, params, chunk):
+        # dtypes are shrunk outside the query's try (see run_query); no categoricals per
+        # chunk, since differing categories would turn back into object on concat
+        yield shrink_dtypes(frame, categories=False)
+
+def _stream_frames(query, params, chunk):
+    with borrow_conn() as cnx:
+        if not cnx:
+            return
+        cur = cnx.cursor(buffered=False)
+        try:
+            cur.execute(query, params or ())
+            if not cur.description:
+                return
+            cols = [c[0] for c in cur.description]
+            while True:
+                rows = cur.fetchmany(chunk)
+                if not rows:
+                    break
+                yield pd.DataFrame.from_records(rows, columns=cols)
+        except Exception as e:
+            st.error(f"Query error: {e}")
+        finally:
+            # drain anything the caller did not consume before the conn goes back to the pool
+            if cnx.unread_result:
+                cnx.consume_results()
+            cur.close()
+
+def concat_chunks(chunks):
+    frames = list(chunks)
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+def run_modification(query, params=None, return_id=False, return_count=False):
+    """Execute a single write (autocommitted by the pool). Returns True/False, or with return_id=True
+       the AUTO_INCREMENT id generated by an INSERT, or with return_count=True the number of rows
+       changed (None on failure in both cases)."""
+    failed = None if return_id or return_count else False
+    with borrow_conn() as cnx:
+        if not cnx:
+            st.error("No DB connection.")
+            return failed
+        cur = cnx.cursor()
+        try:
+            cur.execute(query, params or ())
+            if return_id:
+                return cur.lastrowid
+            return cur.rowcount if return_count else True
+        except Exception as e:
+            st.error(f"Execution error: {e}")
+            try:
+                cnx.rollback()
+            except:
+                pass
+            return failed
+        finally:
+            cur.close()
+
+def run_tx(ops):
+    """Execute a list of (query, params) pairs on one connection and commit once.
+       Returns the lastrowid of each statement, or None if anything failed
+       (in which case the whole batch is rolled back)."""
+    with borrow_conn() as cnx:
+        if not cnx:
+            st.error("No DB connection.")
+            return None
+        cur = cnx.cursor()
+        try:
+            cnx.start_transaction()
+            ids = []
+            for query, params in ops:
+                cur.execute(query, params or ())
+                ids.append(cur.lastrowid)
+            cnx.commit()
+            return ids
+        except Exception as e:
+            st.error(f"Execution error: {e}")
+            try:
+                cnx.rollback()
+            except:
+                pass
+            return None
+        finally:
+            cur.close()
+
+def set_inventory_quantities(qty_by_id):
+    """Set quantity_in_stock for several inventory rows with one UPDATE ... CASE statement.
+       `qty_by_id` maps inventory_id -> new quantity (plain ints). Rows already holding their
+       target value are skipped in SQL, so they are not written and fire no trigger.
+       Returns the ids of the rows actually changed (locked with SELECT ... FOR UPDATE first,
+       in the same transaction, so the list is exact), or None on failure."""
+    ids = list(qty_by_id)
+    if not ids:
+        return []
+    case = "CASE inventory_id " + " ".join(["WHEN %s THEN %s"] * len(ids)) + " END"
+    case_params = tuple(v for i in ids for v in (i, qty_by_id[i]))
+    placeholders = ", ".join(["%s"] * len(ids))
+    where = f"WHERE inventory_id IN ({placeholders}) AND NOT (quantity_in_stock <=> {case})"
+    with borrow_conn() as cnx:
+        if not cnx:
+            st.error("No DB connection.")
+            return None
+        cur = cnx.cursor()
+        try:
+            cnx.start_transaction()
+            cur.execute(f"SELECT inventory_id FROM Inventory {where} FOR UPDATE", tuple(ids) + case_params)
+            changed = [int(r[0]) for r in cur.fetchall()]
+            if changed:
+                cur.execute(f"UPDATE Inventory SET quantity_in_stock = {case} {where}",
+                            case_params + tuple(ids) + case_params)
+            cnx.commit()
+            return changed
+        except Exception as e:
+            st.error(f"Execution error: {e}")
+            try:
+                cnx.rollback()
+            except:
+                pass
+            return None
+        finally:
+            cur.close()
 
 def call_proc(proc_name, params=()):
-    cnx = get_db_conn()
-    if not cnx:
-        st.error("No DB connection.")
-        return None
-    cur = cnx.cursor()
+    with borrow_conn() as cnx:
+        if not cnx:
+            st.error("No DB connection.")
+            return None
+        cur = cnx.cursor()
+        try:
+            cur.callproc(proc_name, params)
+            # callproc has already read every result set of the CALL; stored_results() walks those buffers
+            return [pd.DataFrame.from_records(rs.fetchall(), columns=[c[0] for c in rs.description])
+                    for rs in cur.stored_results()]
+        except Exception as e:
+            st.error(f"Stored procedure error: {e}")
+            return None
+        finally:
+            cur.close()
+
+def run_row(query, params=None):
+    """Return the first row of a query as a tuple, or None (no row / error). No DataFrame is built."""
+    with borrow_conn() as cnx:
+        if not cnx:
+            return None
+        cur = cnx.cursor(buffered=True)
+        try:
+            cur.execute(query, params or ())
+            return cur.fetchone()
+        except Exception as e:
+            st.error(f"Query error: {e}")
+            return None
+        finally:
+            cur.close()
+
+def run_scalar(query, params=None, default=None):
+    row = run_row(query, params)
+    return row[0] if row and row[0] is not None else default
+
+def paginated_query(base_sql, page, page_size, params=None, raise_errors=False):
+    """Fetch one 1-based page of `base_sql` (no LIMIT or trailing ';') with LIMIT/OFFSET."""
+    return run_query(f"{base_sql} LIMIT %s OFFSET %s", tuple(params or ()) + (page_size, (page - 1) * page_size),
+                     raise_errors=raise_errors)
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _cached_page(base_sql, page, page_size, params=None):
+    # raises on failure, so cache_data stores (and replays) nothing for a failed query
+    return paginated_query(base_sql, page, page_size, params, raise_errors=True)
+
+def cached_paginated_query(base_sql, page, page_size, params=None):
+    """paginated_query memoised on (SQL text, page, page size, params) for re-read report pages.
+       Errors are shown here, outside the cache, and the next rerun queries again."""
     try:
-        cur.callproc(proc_name, params)
-        results = []
-        for result in cur.stored_results():
-            results.append(pd.DataFrame(result.fetchall(), columns=[c[0] for c in result.description]))
-        return results
+        return _cached_page(base_sql, page, page_size, params)
     except Exception as e:
-        st.error(f"Stored procedure error: {e}")
-        return None
-    finally:
-        cur.close()
+        st.error(f"Query error: {e}")
+        return pd.DataFrame()
 
 def call_function_sql_scalar(func_sql, params=()):
-    cnx = get_db_conn()
-    if not cnx:
-        st.error("No DB connection.")
-        return None
-    cur = cnx.cursor()
-    try:
-        cur.execute(func_sql, params)
-        res = cur.fetchone()
-        return res[0] if res else None
-    except Exception as e:
-        st.error(f"Function call error: {e}")
-        return None
-    finally:
-        cur.close()
-
+    with borrow_conn() as cnx:
+        if not cnx:
+            st.error("No DB connection.")
+            return None
+        cur = cnx.cursor()
+        try:
+            cur.execute(func_sql, params)
+            res = cur.fetchone()
+            return res[0] if res else None
+        except Exception as e:
+            st.error(f"Function call error: {e}")
+            return None
+        finally:
+            cur.close()
+
+def get_item_costs(item_ids):
+    """Fabric cost and profit margin for many items in one set-based query, following the
+       same rules as the GetItemFabricCost / GetProfitMargin functions (IFNULL to 0, results
+       cast to their DECIMAL return types, margin 0 unless price > 0). Indexed by item_id;
+       ids that do not exist are simply absent."""
+    ids = list(item_ids)
+    if not ids:
+        return pd.DataFrame()
+    placeholders = ", ".join(["%s"] * len(ids))
+    df = run_query(f"""
+    SELECT item_id, fabric_cost,
+           CAST(CASE WHEN price > 0 THEN ((price - fabric_cost) / price) * 100 ELSE 0 END AS DECIMAL(5,2)) AS profit_margin
+    FROM (
+        SELECT ci.item_id, ci.price,
+               CAST(IFNULL(SUM(cif.quantity_used * f.cost_per_meter), 0) AS DECIMAL(10,2)) AS fabric_cost
+        FROM Clothing_Items ci
+        LEFT JOIN Clothing_Item_Fabrics cif ON cif.item_id = ci.item_id
+        LEFT JOIN Fabrics f ON f.fabric_id = cif.fabric_id
+        WHERE ci.item_id IN ({placeholders})
+        GROUP BY ci.item_id, ci.price
+    ) fc
+    """, tuple(ids))
+    return df.set_index('item_id') if not df.empty else df
+
+@st.cache_data(ttl=24*60*60, show_spinner=False)
 def get_proc_param_count(proc_name):
     """Return number of IN parameters for a stored procedure in the current DB.
-       This uses information_schema.parameters; if unavailable, returns None."""
+       This uses information_schema.parameters; raises if the lookup fails, so cache_data
+       stores nothing and the next call queries again."""
     q = """
     SELECT COUNT(*) AS cnt
     FROM information_schema.parameters
     WHERE specific_schema = %s AND specific_name = %s
       AND parameter_mode IN ('IN','INOUT')
     """
-    df = run_query(q, (DB_CONFIG['database'], proc_name))
-    if df is None or df.empty:
-        return None
-    try:
-        return int(df['cnt'].iloc[0])
-    except:
-        return None
+    return _schema_count(q, (DB_CONFIG['database'], proc_name))
+
+# ---------------- CSV export ----------------
+def download_query_as_csv(query, params=None, chunk=5000):
+    """Write a query result straight from an unbuffered cursor into CSV bytes, without pandas.
+       Used as a deferred st.download_button callable, which runs on another thread where
+       st.error shows nothing, so failures raise and the download fails instead of
+       delivering an empty or truncated file."""
+    buf = io.BytesIO()
+    text = io.TextIOWrapper(buf, encoding='utf-8', newline='')
+    with borrow_conn(get_background_pool()) as cnx:
+        if not cnx:
+            raise RuntimeError("No DB connection.")
+        cur = cnx.cursor(buffered=False)
+        try:
+            cur.execute(query, params or ())
+            writer = csv.writer(text, lineterminator='\n')
+            writer.writerow([c[0] for c in cur.description])
+            while True:
+                rows = cur.fetchmany(chunk)
+                if not rows:
+                    break
+                writer.writerows(rows)
+        finally:
+            if cnx.unread_result:
+                cnx.consume_results()
+            cur.close()
+    text.flush()
+    text.detach()
+    buf.seek(0)
+    return buf
+
+# ---------------- cached lookups (dropdown feeders) ----------------
+# cache_resource hands every rerun the same DataFrame object instead of
+# unpickling a fresh copy, so callers must treat these frames as read-only
+# (derive with set_index/copy, never modify in place).
+def cached_lookup(loader):
+    """Cache `loader` with st.cache_resource(ttl=600). The loader must raise on DB errors:
+       cache_resource does not cache exceptions, so a failed load shows an error and an empty
+       frame for this run only, and the next rerun queries again instead of serving the empty
+       result for the whole TTL."""
+    cached = st.cache_resource(ttl=600, show_spinner=False)(loader)
+    def get():
+        try:
+            return cached()
+        except Exception as e:
+            st.error(f"Could not load reference data: {e}")
+            return pd.DataFrame()
+    get.clear = cached.clear
+    return get
+
+@cached_lookup
+def get_items_lookup():
+    return run_query("SELECT item_id, name FROM Clothing_Items", raise_errors=True)
+
+@cached_lookup
+def get_stores_lookup():
+    return run_query("SELECT store_id, name FROM Stores", raise_errors=True)
+
+@cached_lookup
+def get_collections_lookup():
+    return run_query("SELECT collection_id, name FROM Collections", raise_errors=True)
+
+@cached_lookup
+def get_designers_lookup():
+    return run_query("SELECT designer_id, name FROM Designers", raise_errors=True)
+
+@cached_lookup
+def get_suppliers_lookup():
+    return run_query("SELECT supplier_id, name FROM Suppliers", raise_errors=True)
+
+@cached_lookup
+def get_inventory_lookup():
+    # indexed by inventory_id so a selected row is an O(1) .at lookup
+    # ordered so row positions are stable across reloads (the batch data_editor tracks edits by position)
+    df = run_query("SELECT inventory_id, item_id, quantity_in_stock, reorder_level FROM Inventory ORDER BY inventory_id", raise_errors=True)
+    return df.set_index('inventory_id') if not df.empty else df
+
+def clear_lookups():
+    for loader in (get_items_lookup, get_stores_lookup, get_collections_lookup,
+                   get_designers_lookup, get_suppliers_lookup, get_inventory_lookup):
+        loader.clear()
 
 # ---------------- support tables creation ----------------
+def _schema_count(query, params):
+    """COUNT(*) against information_schema; raises instead of reading a failed lookup as 0,
+       so callers (and the caches around them) never mistake a DB error for "missing"."""
+    row = run_row(query, params)
+    if row is None:
+        raise RuntimeError("Could not read information_schema.")
+    return int(row[0])
+
+@st.cache_data(ttl=24*60*60, show_spinner=False)
 def column_exists(table_name, column_name):
     q = """
     SELECT COUNT(*) cnt FROM information_schema.columns
     WHERE table_schema = %s AND table_name = %s AND column_name = %s
     """
-    df = run_query(q, (DB_CONFIG['database'], table_name, column_name))
-    if df.empty:
-        return False
-    return int(df['cnt'].iloc[0]) > 0
+    return _schema_count(q, (DB_CONFIG['database'], table_name, column_name)) > 0
+
+def table_exists(table_name):
+    q = """
+    SELECT COUNT(*) cnt FROM information_schema.tables
+    WHERE table_schema = %s AND table_name = %s
+    """
+    return _schema_count(q, (DB_CONFIG['database'], table_name)) > 0
+
+def index_exists(table_name, index_name):
+    q = """
+    SELECT COUNT(*) cnt FROM information_schema.statistics
+    WHERE table_schema = %s AND table_name = %s AND index_name = %s
+    """
+    return _schema_count(q, (DB_CONFIG['database'], table_name, index_name)) > 0
+
+def trigger_exists(trigger_name):
+    q = """
+    SELECT COUNT(*) cnt FROM information_schema.triggers
+    WHERE trigger_schema = %s AND trigger_name = %s
+    """
+    return _schema_count(q, (DB_CONFIG['database'], trigger_name)) > 0
+
+def ensure_index(table_name, index_name, columns):
+    # MySQL has no CREATE INDEX IF NOT EXISTS, so check information_schema first
+    if table_exists(table_name) and not index_exists(table_name, index_name):
+        return run_modification(f"CREATE INDEX {index_name} ON {table_name} ({columns})")
+    return True
+
+def ensure_indexes():
+    """Indexes backing the hot ORDER BY / WHERE clauses used by the pages below.
+       Returns False if any of them could not be created."""
+    ok = [
+        ensure_index("Sales", "idx_sales_date", "sale_date DESC"),
+        ensure_index("Inventory_Alerts", "idx_alerts_date", "alert_date DESC"),
+        ensure_index("Clothing_Item_Fabrics", "idx_cif_item_fabric", "item_id, fabric_id"),
+        ensure_index("Fabrics", "idx_fabrics_supplier_cost", "supplier_id, cost_per_meter"),
+        ensure_index("Clothing_Items", "idx_ci_collection_price", "collection_id, price"),
+    ]
+    # an index on (quantity_in_stock, reorder_level) cannot serve the column-to-column
+    # low-stock test and only slowed stock updates; remove it where an earlier run created it
+    if index_exists("Inventory", "idx_inv_stock_reorder"):
+        ok.append(run_modification("DROP INDEX idx_inv_stock_reorder ON Inventory"))
+    return all(ok)
 
 def ensure_app_users_table():
     q = """
@@ -144,7 +581,7 @@ def ensure_app_users_table():
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
     );
     """
-    run_modification(q)
+    return run_modification(q)
 
 def ensure_purchase_orders_table():
     q = """
@@ -161,7 +598,7 @@ def ensure_purchase_orders_table():
         FOREIGN KEY (supplier_id) REFERENCES Suppliers(supplier_id)
     );
     """
-    run_modification(q)
+    return run_modification(q)
 
 def ensure_audit_log_table():
     q = """
@@ -176,18 +613,107 @@ def ensure_audit_log_table():
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
     );
     """
-    run_modification(q)
+    return run_modification(q)
+
+def ensure_cheapest_supplier_view():
+    # one row per item: the supplier of its cheapest fabric (used by the auto-PO flow);
+    # ties on cost go to the lowest supplier_id so the pick is deterministic
+    q = """
+    CREATE OR REPLACE VIEW v_cheapest_supplier_per_item AS
+    SELECT item_id, supplier_id, supplier_name, min_cost
+    FROM (
+        SELECT cif.item_id, f.supplier_id, s.name AS supplier_name, f.cost_per_meter AS min_cost,
+               ROW_NUMBER() OVER (PARTITION BY cif.item_id ORDER BY f.cost_per_meter ASC, f.supplier_id ASC) AS rn
+        FROM Clothing_Item_Fabrics cif
+        JOIN Fabrics f ON cif.fabric_id = f.fabric_id
+        JOIN Suppliers s ON f.supplier_id = s.supplier_id
+    ) ranked
+    WHERE rn = 1;
+    """
+    return run_modification(q)
 
-ensure_app_users_table()
-ensure_purchase_orders_table()
-ensure_audit_log_table()
+def ensure_item_sales_summary():
+    # per-item running totals so "Top Selling Items" reads one row per item instead of
+    # aggregating all of Sales; kept current by an AFTER INSERT trigger (Sales updates
+    # and deletes are not reflected, matching how the app only ever inserts sales)
+    if not table_exists("Sales"):
+        return True
+    if not run_modification("""
+    CREATE TABLE IF NOT EXISTS item_sales_summary (
+        item_id INT PRIMARY KEY,
+        qty_sold BIGINT NOT NULL DEFAULT 0,
+        revenue DECIMAL(14, 2) NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        KEY idx_iss_qty (qty_sold),
+        FOREIGN KEY (item_id) REFERENCES Clothing_Items(item_id)
+    );
+    """):
+        return False
+    if not trigger_exists("trg_sales_ai") and not run_modification("""
+    CREATE TRIGGER trg_sales_ai
+    AFTER INSERT ON Sales
+    FOR EACH ROW
+    BEGIN
+        IF NEW.item_id IS NOT NULL THEN
+            INSERT INTO item_sales_summary (item_id, qty_sold, revenue)
+            VALUES (NEW.item_id, IFNULL(NEW.quantity_sold, 0), IFNULL(NEW.total_amount, 0))
+            ON DUPLICATE KEY UPDATE qty_sold = qty_sold + IFNULL(NEW.quantity_sold, 0),
+                                    revenue = revenue + IFNULL(NEW.total_amount, 0);
+        END IF;
+    END
+    """):
+        return False
+    # re-sync from Sales on every bootstrap (once per process): an empty-table check is not
+    # enough, since after a failed backfill the trigger soon makes the table non-empty. It runs
+    # after the trigger exists and overwrites rather than adds, so repeating it is safe and
+    # rows the trigger touched are not counted twice
+    return run_modification("""
+    INSERT INTO item_sales_summary (item_id, qty_sold, revenue)
+    SELECT * FROM (
+        SELECT item_id, IFNULL(SUM(quantity_sold), 0) AS qty_sold, IFNULL(SUM(total_amount), 0) AS revenue
+        FROM Sales WHERE item_id IS NOT NULL GROUP BY item_id
+    ) agg
+    ON DUPLICATE KEY UPDATE qty_sold = agg.qty_sold, revenue = agg.revenue
+    """)
+
+@st.cache_resource
+def _bootstrap_schema():
+    # runs once per server process instead of on every script rerun; a failed step raises,
+    # and cache_resource does not cache exceptions, so the next rerun tries again
+    steps = (ensure_app_users_table, ensure_purchase_orders_table, ensure_audit_log_table,
+             ensure_cheapest_supplier_view, ensure_item_sales_summary, ensure_indexes)
+    failed = [step.__name__ for step in steps if not step()]
+    if failed:
+        raise RuntimeError(f"Schema setup incomplete ({', '.join(failed)})")
+    return True
+
+try:
+    _bootstrap_schema()
+except RuntimeError as e:
+    st.error(f"{e}; retrying on the next rerun.")
 
 # ---------------- security: password hashing ----------------
 def make_salt():
-    return binascii.hexlify(pyos.urandom(16)).decode()
-
-def hash_password(password, salt):
-    return hashlib.sha256((salt + password).encode()).hexdigest()
+    return secrets.token_hex(16)
+
+SCRYPT_N, SCRYPT_R, SCRYPT_P = 2**15, 8, 1
+SCRYPT_MAXMEM = 64 * 1024 * 1024  # n=2**15, r=8 needs 32 MiB, above OpenSSL's default cap
+
+def hash_password(password, salt, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P):
+    """scrypt (memory-hard); the cost parameters are stored with the hash so they can be raised later."""
+    dk = hashlib.scrypt(password.encode(), salt=bytes.fromhex(salt), n=n, r=r, p=p, maxmem=SCRYPT_MAXMEM, dklen=32)
+    return f"scrypt${n}${r}${p}${dk.hex()}"
+
+def verify_password(password, salt, stored):
+    if stored.startswith("scrypt$"):
+        n, r, p = (int(x) for x in stored.split("$")[1:4])
+        return hmac.compare_digest(hash_password(password, salt, n, r, p), stored)
+    if stored.startswith("pbkdf2_sha256$"):
+        iterations = int(stored.split("$")[1])
+        dk = hashlib.pbkdf2_hmac('sha256', password.encode(), bytes.fromhex(salt), iterations)
+        return hmac.compare_digest(f"pbkdf2_sha256${iterations}${dk.hex()}", stored)
+    # legacy single-round sha256(salt + password)
+    return hmac.compare_digest(hashlib.sha256((salt + password).encode()).hexdigest(), stored)
 
 def create_app_user(username, role, password):
     salt = make_salt()
@@ -195,7 +721,7 @@ def create_app_user(username, role, password):
     return run_modification("INSERT INTO app_users (username, role, password_hash, salt) VALUES (%s,%s,%s,%s)", (username, role, phash, salt))
 
 def authenticate_user(username, password):
-    df = run_query("SELECT * FROM app_users WHERE username = %s", (username,))
+    df = run_prepared_query("SELECT app_user_id, username, role, password_hash, salt FROM app_users WHERE username = %s", (username,))
     if df is None or df.empty:
         return None
     row = df.iloc[0]
@@ -203,16 +729,111 @@ def authenticate_user(username, password):
     stored = row.get('password_hash')
     if salt is None or stored is None:
         return None
-    if hash_password(password, salt) == stored:
+    if verify_password(password, salt, stored):
         return row.to_dict()
     return None
 
 # ---------------- audit logging ----------------
+AUDIT_INSERT_SQL = "INSERT INTO audit_log (app_user_id, username, action, table_name, row_id, details) VALUES (%s,%s,%s,%s,%s,%s)"
+AUDIT_FLUSH_INTERVAL = 0.2  # seconds
+AUDIT_MAX_ATTEMPTS = 5  # write attempts per row before it is given up
+
+# the writer thread has no script context, so st.error would be lost; failures go to logging
+audit_logger = logging.getLogger("fashiondb.audit")
+
+def _audit_write_row(cnx, prepared, row):
+    cur = prepared.get(cnx.connection_id)
+    if cur is None:
+        cur = prepared[cnx.connection_id] = cnx.cursor(prepared=True)
+    # same string object every time, so the statement is prepared only once
+    cur.execute(AUDIT_INSERT_SQL, row)
+
+def _audit_requeue(queue, entries, err):
+    """Put failed (row, attempts) entries back at the front of the queue, dropping any that
+       have used up AUDIT_MAX_ATTEMPTS."""
+    retry = []
+    for row, attempts in entries:
+        if attempts + 1 < AUDIT_MAX_ATTEMPTS:
+            retry.append((row, attempts + 1))
+        else:
+            audit_logger.error("Audit log write failed %d times (%s); dropped row %r", AUDIT_MAX_ATTEMPTS, err, row)
+    queue.extendleft(reversed(retry))
+
+def _audit_close_prepared(prepared, cnx):
+    # closing the cursor also deallocates its server-side statement
+    cur = prepared.pop(cnx.connection_id, None)
+    if cur is not None:
+        try:
+            cur.close()
+        except Exception:
+            pass
+
+def _audit_flush(queue, pool, prepared, batch):
+    """Write `batch` of (row, attempts) entries. Entries leave `batch` once written or requeued,
+       so whatever is still in it after an unexpected error has not been handled yet."""
+    try:
+        cnx = get_pooled_connection(pool)
+    except Exception as err:
+        # pool exhausted or DB unreachable: keep the rows (attempts unchanged) for the next round
+        queue.extendleft(reversed(batch))
+        batch.clear()
+        audit_logger.warning("Audit log: no DB connection (%s), retrying.", err)
+        return
+    try:
+        if len(batch) > 1:
+            try:
+                cur = cnx.cursor()
+                try:
+                    cur.executemany(AUDIT_INSERT_SQL, [row for row, _ in batch])
+                finally:
+                    cur.close()
+                batch.clear()
+            except Exception as err:
+                audit_logger.warning("Audit log batch of %d failed (%s); retrying row by row.", len(batch), err)
+        failed, last_err = [], None
+        while batch:
+            entry = batch.pop(0)
+            try:
+                _audit_write_row(cnx, prepared, entry[0])
+            except Exception as err:
+                _audit_close_prepared(prepared, cnx)
+                failed.append(entry)
+                last_err = err
+        if failed:
+            _audit_requeue(queue, failed, last_err)
+    finally:
+        cnx.close()
+
+def _audit_writer(queue, pool):
+    """Background loop: every AUDIT_FLUSH_INTERVAL, write all queued audit rows. Bursts go out as
+       one executemany (a single multi-row INSERT); a lone row, or every row of a burst that failed,
+       goes through a server-side prepared INSERT kept per pooled connection, so one bad row
+       cannot take the rest of the batch with it."""
+    # thread-local on purpose: st.cache_resource (get_prepared_cursors) expects a script context
+    prepared = {}
+    while True:
+        time.sleep(AUDIT_FLUSH_INTERVAL)
+        if not queue:
+            continue
+        batch = []
+        while queue:
+            batch.append(queue.popleft())
+        try:
+            _audit_flush(queue, pool, prepared, batch)
+        except Exception as err:
+            # nothing may end this thread: audit_log would keep filling a deque nobody drains
+            audit_logger.exception("Audit writer error; requeueing %d row(s).", len(batch))
+            _audit_requeue(queue, batch, err)
+
+@st.cache_resource
+def get_audit_queue():
+    queue = deque()
+    threading.Thread(target=_audit_writer, args=(queue, get_background_pool()), daemon=True, name="audit-writer").start()
+    return queue
+
 def audit_log(app_user_id, username, action, table_name, row_id, details):
-    run_modification(
-        "INSERT INTO audit_log (app_user_id, username, action, table_name, row_id, details) VALUES (%s,%s,%s,%s,%s,%s)",
-        (app_user_id, username, action, table_name, str(row_id), details)
-    )
+    # queued and written by the audit-writer thread, so the UI does not wait on the INSERT
+    get_audit_queue().append(((app_user_id, username, action, table_name, str(row_id), details), 0))
 
 # ---------------- session & login ----------------
 if "app_user" not in st.session_state:
@@ -235,6 +856,10 @@ def logout():
 if not hasattr(st, "rerun") and hasattr(st, "experimental_rerun"):
     st.rerun = st.experimental_rerun
 
+# backward-compatible fragment shim
+if not hasattr(st, "fragment") and hasattr(st, "experimental_fragment"):
+    st.fragment = st.experimental_fragment
+
 # ---------------- sidebar & navigation ----------------
 st.sidebar.title("FashionDB App")
 st.sidebar.markdown("**DB**: " + DB_CONFIG['database'])
@@ -257,6 +882,8 @@ page = st.sidebar.selectbox("Page", [
     "Collections & Designers", "Alerts & Triggers", "Procedures & Functions",
     "Reports", "Admin (App Users)", "Purchase Orders", "Audit Log", "SQL Runner"
 ])
+if st.sidebar.button("Refresh reference data"):
+    clear_lookups()
 
 def current_role():
     user = st.session_state.get("app_user")
@@ -266,16 +893,117 @@ def current_user_id():
     user = st.session_state.get("app_user")
     return int(user['app_user_id']) if user else None
 
+def show_paginated_report(key, base_sql, csv_label, csv_name, empty_msg="No results.", cached=False):
+    col_size, col_page = st.columns(2)
+    page_size = col_size.selectbox("Page size", [25, 50, 100], key=f"{key}_page_size")
+    page_no = col_page.number_input("Page", min_value=1, value=1, step=1, key=f"{key}_page")
+    loader = cached_paginated_query if cached else paginated_query
+    df = loader(base_sql, int(page_no), page_size)
+    if df is None or df.empty:
+        st.info(empty_msg)
+        return
+    st.dataframe(df)
+    # the CSV covers the whole result; a callable defers the query until the button is clicked
+    st.download_button(csv_label, lambda: download_query_as_csv(base_sql), csv_name, key=f"{key}_csv")
+
+# selectable output columns of the Complete Product Info join -> SQL expression;
+# the SELECT list is only ever built from these keys, never from raw user text
+PRODUCT_INFO_COLUMNS = {
+    "item_id": "ci.item_id",
+    "item_name": "ci.name",
+    "price": "ci.price",
+    "collection_name": "c.name",
+    "designer_name": "d.name",
+    "fabric": "f.material",
+    "supplier_name": "s.name",
+}
+
+# leading whitespace / plain comments, then SELECT or WITH; compiled once per process.
+# "-- " needs trailing whitespace to be a comment in MySQL, and only plain /* */ comments
+# are skipped (executable /*! */ and optimizer-hint /*+ */ ones are rejected outright)
+READ_ONLY_SQL_RE = re.compile(r"(?:\s+|--(?=\s)[^\n]*(?:\n|$)|#[^\n]*(?:\n|$)|/\*(?![!+]).*?\*/)*(?:select|with)\b", re.I | re.S)
+
+# file access from a SELECT: a READ ONLY transaction does not stop these
+FILE_ACCESS_SQL_RE = re.compile(r"\binto\s+(?:outfile|dumpfile)\b|\bload_file\s*\(", re.I)
+
+def is_read_only_sql(q):
+    # a single statement only: anything after a ';' other than whitespace is rejected;
+    # MySQL executes the contents of /*! ... */, so such comments are refused anywhere
+    body = q.strip().rstrip(';')
+    if ';' in body or '/*!' in body or '/*+' in body:
+        return False
+    if FILE_ACCESS_SQL_RE.search(body):
+        return False
+    return READ_ONLY_SQL_RE.match(body) is not None
+
+# ---------------- procedure fragments ----------------
+# each @st.fragment reruns only its own block when its widgets change,
+# instead of re-executing the whole page script
+@st.fragment
+def show_fabric_cost(item_map):
+    sel_item = st.selectbox("Item", item_map.index.tolist(), format_func=lambda x: item_map.at[x])
+    if st.button("Compute fabric cost"):
+        costs = get_item_costs([sel_item])
+        val = costs.at[sel_item, 'fabric_cost'] if sel_item in costs.index else 0
+        st.write(f"Fabric cost for '{item_map.at[sel_item]}': ₹{val}")
+
+@st.fragment
+def show_profit_margin(item_map):
+    sel_item2 = st.selectbox("Item for margin", item_map.index.tolist(), key="margin_item", format_func=lambda x: item_map.at[x])
+    if st.button("Compute profit margin"):
+        costs = get_item_costs([sel_item2])
+        val = costs.at[sel_item2, 'profit_margin'] if sel_item2 in costs.index else 0
+        st.write(f"Profit margin for '{item_map.at[sel_item2]}': {val}%")
+
+@st.fragment
+def show_designer_revenue(dmap):
+    sel_d = st.selectbox("Designer", dmap.index.tolist(), format_func=lambda x: dmap.at[x])
+    if st.button("Compute designer revenue"):
+        val = call_function_sql_scalar("SELECT GetDesignerRevenue(%s)", (sel_d,))
+        st.write(f"Revenue for designer '{dmap.at[sel_d]}': ₹{val}")
+
+@st.fragment
+def show_designer_portfolio(dmap):
+    sel_d = st.selectbox("Select Designer (for portfolio)", dmap.index.tolist(), format_func=lambda x: dmap.at[x])
+    if st.button("Show Designer Portfolio"):
+        # Call the stored procedure
+        res = call_proc("GetDesignerPortfolio", (sel_d,))
+        if res and len(res) >= 1:
+            st.success(f"Portfolio for Designer: {dmap.at[sel_d]}")
+            # Procedure may return multiple result sets: Designer info, Collections, Items
+            labels = ["Designer Info", "Collections", "Items"]
+            for i, dfp in enumerate(res):
+                st.markdown(f"#### {labels[i] if i < len(labels) else f'Result {i+1}'}")
+                st.dataframe(dfp)
+        else:
+            st.warning("No data returned for this designer.")
+
+@st.fragment
+def show_monthly_sales_report(smap):
+    sel_store = st.selectbox("Select Store", smap.index.tolist(), format_func=lambda x: smap.at[x])
+    col_m, col_y = st.columns(2)
+    month = col_m.number_input("Month (1-12)", min_value=1, max_value=12, value=_dt.datetime.now().month)
+    year = col_y.number_input("Year", min_value=2000, max_value=2100, value=_dt.datetime.now().year)
+    if st.button("Generate Monthly Sales Report"):
+        res = call_proc("MonthlySalesReport", (sel_store, month, year))
+        if res and len(res) >= 1:
+            st.success(f"Monthly Sales Report for {smap.at[sel_store]} ({month}/{year})")
+            st.dataframe(res[0])
+        else:
+            st.warning("No data found for this period.")
+
 # ---------------- main app ----------------
 st.title("Fashion Business — Management ")
 
 # ---------- Dashboard ----------
 if page == "Dashboard":
     st.header("Dashboard")
-    df_rev = run_query("SELECT IFNULL(SUM(total_amount),0) AS total_revenue FROM Sales")
-    total_revenue = float(df_rev['total_revenue'].iloc[0]) if not df_rev.empty else 0.0
-    df_low = run_query("SELECT COUNT(*) AS low_count FROM Inventory WHERE quantity_in_stock <= reorder_level")
-    low_count = int(df_low['low_count'].iloc[0]) if not df_low.empty else 0
+    kpi = run_row("""
+    SELECT (SELECT IFNULL(SUM(total_amount),0) FROM Sales) AS total_revenue,
+           (SELECT COUNT(*) FROM Inventory WHERE quantity_in_stock <= reorder_level) AS low_count
+    """)
+    total_revenue = float(kpi[0]) if kpi else 0.0
+    low_count = int(kpi[1]) if kpi else 0
     col1, col2 = st.columns(2)
     col1.metric("Total Revenue", f"₹{total_revenue:,.2f}")
     col2.metric("Low Stock Items", f"{low_count}")
@@ -284,26 +1012,28 @@ if page == "Dashboard":
     st.dataframe(df_sales)
 
     st.markdown("### Monthly Revenue Trend (last 12 months)")
+    # the recursive CTE yields all 12 month starts, so months without sales come back as 0
     q = """
-    SELECT YEAR(sale_date) AS yr, MONTH(sale_date) AS mon, IFNULL(SUM(total_amount),0) AS revenue
-    FROM Sales
-    WHERE sale_date >= DATE_SUB(CURDATE(), INTERVAL 12 MONTH)
-    GROUP BY YEAR(sale_date), MONTH(sale_date)
-    ORDER BY YEAR(sale_date), MONTH(sale_date);
+    WITH RECURSIVE months (month_start) AS (
+        SELECT CURDATE() - INTERVAL (DAYOFMONTH(CURDATE()) - 1) DAY
+        UNION ALL
+        SELECT month_start - INTERVAL 1 MONTH FROM months
+        WHERE month_start > CURDATE() - INTERVAL 11 MONTH
+    )
+    SELECT CONCAT(YEAR(m.month_start), '-', LPAD(MONTH(m.month_start), 2, '0')) AS ym,
+           IFNULL(SUM(s.total_amount), 0) AS revenue
+    FROM months m
+    LEFT JOIN Sales s
+      ON s.sale_date >= m.month_start AND s.sale_date < m.month_start + INTERVAL 1 MONTH
+    GROUP BY m.month_start
+    ORDER BY m.month_start;
     """
     df_month = run_query(q)
-    if df_month is not None and not df_month.empty:
-        today_dt = _dt.datetime.now()
-        months = []
-        revs = []
-        for i in range(11, -1, -1):
-            d = today_dt - pd.DateOffset(months=i)
-            y = d.year; m = d.month
-            months.append(f"{y}-{m:02d}")
-            match = df_month[(df_month['yr'] == y) & (df_month['mon'] == m)]
-            revs.append(float(match['revenue'].iloc[0]) if not match.empty else 0.0)
+    if df_month is not None and not df_month.empty and df_month['revenue'].astype(float).any():
+        months = df_month['ym'].tolist()
+        revs = df_month['revenue'].astype(float)
         fig, ax = plt.subplots()
-        ax.plot(months, revs, marker='o')
+        ax.plot(months, revs.tolist(), marker='o')
         ax.set_title("Monthly Revenue (last 12 months)")
         ax.set_xlabel("Month")
         ax.set_ylabel("Revenue (₹)")
@@ -316,6 +1046,7 @@ if page == "Dashboard":
 elif page == "Items":
     st.header("Clothing Items — CRUD (Admin/Manager)")
     role = current_role()
+    items_df = get_items_lookup()
     st.info("Only admin can create/delete items; manager can update.")
     if role == "admin":
         with st.form("create_item"):
@@ -324,17 +1055,18 @@ elif page == "Items":
             size = st.text_input("Size")
             color = st.text_input("Color")
             price = st.number_input("Price", min_value=0.0, step=1.0)
-            cols = run_query("SELECT collection_id, name FROM Collections")
+            cols = get_collections_lookup()
             collection_id = None
             if not cols.empty:
-                col_map = dict(zip(cols['collection_id'], cols['name']))
-                collection_id = st.selectbox("Collection", options=list(col_map.keys()), format_func=lambda x: col_map[x])
+                col_map = cols.set_index('collection_id')['name']
+                collection_id = st.selectbox("Collection", options=col_map.index.tolist(), format_func=lambda x: col_map.at[x])
             submitted = st.form_submit_button("Create Item")
             if submitted:
                 q = "INSERT INTO Clothing_Items (name, size, color, price, collection_id) VALUES (%s,%s,%s,%s,%s)"
                 ok = run_modification(q, (name, size, color, price, collection_id))
                 if ok:
                     st.success("Item created.")
+                    get_items_lookup.clear()
                     audit_log(current_user_id(), st.session_state['app_user']['username'], "CREATE_ITEM", "Clothing_Items", "", f"{name}")
                     st.rerun()
     df = run_query("SELECT ci.item_id, ci.name, ci.size, ci.color, ci.price, c.name AS collection FROM Clothing_Items ci LEFT JOIN Collections c ON ci.collection_id = c.collection_id")
@@ -344,11 +1076,10 @@ elif page == "Items":
         st.dataframe(df)
     if role in ("admin", "manager"):
         st.subheader("Update item")
-        items = run_query("SELECT item_id, name FROM Clothing_Items")
-        if not items.empty:
-            item_map = dict(zip(items['item_id'], items['name']))
-            sel = st.selectbox("Item to update", list(item_map.keys()), format_func=lambda x: item_map[x])
-            current = run_query("SELECT * FROM Clothing_Items WHERE item_id = %s", (sel,))
+        if not items_df.empty:
+            item_map = items_df.set_index('item_id')['name']
+            sel = st.selectbox("Item to update", item_map.index.tolist(), format_func=lambda x: item_map.at[x])
+            current = run_query("SELECT name, price FROM Clothing_Items WHERE item_id = %s", (sel,))
             if not current.empty:
                 row = current.iloc[0]
                 new_name = st.text_input("Name", row['name'])
@@ -357,18 +1088,19 @@ elif page == "Items":
                     ok = run_modification("UPDATE Clothing_Items SET name=%s, price=%s WHERE item_id=%s", (new_name, new_price, sel))
                     if ok:
                         st.success("Updated.")
+                        get_items_lookup.clear()
                         audit_log(current_user_id(), st.session_state['app_user']['username'], "UPDATE_ITEM", "Clothing_Items", sel, f"name->{new_name},price->{new_price}")
                         st.rerun()
     if role == "admin":
         st.subheader("Delete item")
-        del_items = run_query("SELECT item_id, name FROM Clothing_Items")
-        if not del_items.empty:
-            del_map = dict(zip(del_items['item_id'], del_items['name']))
-            to_del = st.selectbox("Item to delete", list(del_map.keys()), format_func=lambda x: del_map[x])
+        if not items_df.empty:
+            del_map = items_df.set_index('item_id')['name']
+            to_del = st.selectbox("Item to delete", del_map.index.tolist(), format_func=lambda x: del_map.at[x])
             if st.button("Delete item"):
                 ok = run_modification("DELETE FROM Clothing_Items WHERE item_id=%s", (to_del,))
                 if ok:
                     st.success("Deleted.")
+                    get_items_lookup.clear()
                     audit_log(current_user_id(), st.session_state['app_user']['username'], "DELETE_ITEM", "Clothing_Items", to_del, "deleted")
                     st.rerun()
 
@@ -382,18 +1114,17 @@ elif page == "Inventory":
         st.dataframe(inv)
 
     st.subheader("Update stock (increase/decrease)")
-    items = run_query("SELECT inventory_id, item_id, quantity_in_stock, reorder_level FROM Inventory")
+    items = inv.set_index('inventory_id')[['item_id', 'quantity_in_stock', 'reorder_level']] if inv is not None and not inv.empty else None
     if items is not None and not items.empty:
-        inv_map = dict(zip(items['inventory_id'], items['item_id']))
-        chosen_inv = st.selectbox("Select inventory row", list(inv_map.keys()))
-        cur_row = items[items['inventory_id'] == chosen_inv].iloc[0]
-        cur_qty = int(cur_row['quantity_in_stock'])
-        st.write(f"Current quantity: {cur_qty}  |  Reorder level: {int(cur_row['reorder_level'])}")
+        chosen_inv = st.selectbox("Select inventory row", items.index.tolist())
+        cur_qty = int(items.at[chosen_inv, 'quantity_in_stock'])
+        st.write(f"Current quantity: {cur_qty}  |  Reorder level: {int(items.at[chosen_inv, 'reorder_level'])}")
         delta = st.number_input("Change (positive to add, negative to remove)", value=0, step=1)
         if st.button("Apply stock change"):
-            ok = run_modification("UPDATE Inventory SET quantity_in_stock = quantity_in_stock + %s WHERE inventory_id = %s", (delta, chosen_inv))
+            ok = run_prepared_modification("UPDATE Inventory SET quantity_in_stock = quantity_in_stock + %s WHERE inventory_id = %s", (delta, chosen_inv))
             if ok:
                 st.success("Inventory updated.")
+                get_inventory_lookup.clear()
                 audit_log(current_user_id(), st.session_state['app_user']['username'], "UPDATE_INVENTORY", "Inventory", chosen_inv, f"delta={delta}")
                 st.rerun()
 
@@ -403,12 +1134,14 @@ elif page == "Inventory":
                 ok = run_modification("UPDATE Inventory SET quantity_in_stock = 0 WHERE inventory_id = %s", (chosen_inv,))
                 if ok:
                     st.success("Inventory quantity set to 0.")
+                    get_inventory_lookup.clear()
                     audit_log(current_user_id(), st.session_state['app_user']['username'], "ZERO_INVENTORY", "Inventory", chosen_inv, "set to 0")
                     st.rerun()
             if st.button("Delete inventory row"):
                 ok = run_modification("DELETE FROM Inventory WHERE inventory_id = %s", (chosen_inv,))
                 if ok:
                     st.success("Inventory row deleted.")
+                    get_inventory_lookup.clear()
                     audit_log(current_user_id(), st.session_state['app_user']['username'], "DELETE_INVENTORY", "Inventory", chosen_inv, "deleted")
                     st.rerun()
     else:
@@ -418,23 +1151,26 @@ elif page == "Inventory":
 elif page == "Sales":
     st.header("Sales - ProcessSale and recent sales")
     st.markdown("Use ProcessSale (stored proc) to process sales. App will adapt to procedure signature (4 or 5 params).")
-    items = run_query("SELECT item_id, name FROM Clothing_Items")
-    stores = run_query("SELECT store_id, name FROM Stores")
+    items = get_items_lookup()
+    stores = get_stores_lookup()
     if not items.empty and not stores.empty:
-        item_map = dict(zip(items['item_id'], items['name']))
-        store_map = dict(zip(stores['store_id'], stores['name']))
+        item_map = items.set_index('item_id')['name']
+        store_map = stores.set_index('store_id')['name']
         with st.form("proc_sale"):
-            sel_item = st.selectbox("Item", list(item_map.keys()), format_func=lambda x: item_map[x])
-            sel_store = st.selectbox("Store", list(store_map.keys()), format_func=lambda x: store_map[x])
+            sel_item = st.selectbox("Item", item_map.index.tolist(), format_func=lambda x: item_map.at[x])
+            sel_store = st.selectbox("Store", store_map.index.tolist(), format_func=lambda x: store_map.at[x])
             qty = st.number_input("Quantity", min_value=1, step=1)
             payment = st.selectbox("Payment method", ["Cash", "Credit Card", "Debit Card", "UPI", "Net Banking"])
             submit = st.form_submit_button("Process Sale")
             if submit:
-                # adapt to procedure signature
-                cnt = get_proc_param_count("ProcessSale")
+                # adapt to procedure signature; without it, refuse rather than guess the arity
+                try:
+                    cnt = get_proc_param_count("ProcessSale")
+                except RuntimeError as e:
+                    cnt = None
+                    st.error(f"Could not determine the ProcessSale signature ({e}); sale not processed, please retry.")
                 if cnt is None:
-                    st.warning("Could not determine ProcessSale parameter count; attempting 4-arg call.")
-                    params = (sel_item, sel_store, qty, payment)
+                    params = None
                 elif cnt >= 5:
                     # assume signature: (p_sale_date, p_store_id, p_item_id, p_quantity, p_payment)
                     sale_date = _dt.datetime.now().date()
@@ -442,15 +1178,16 @@ elif page == "Sales":
                 else:
                     # assume signature: (p_item_id, p_store_id, p_quantity, p_payment)
                     params = (sel_item, sel_store, qty, payment)
-                res = call_proc("ProcessSale", params)
+                res = call_proc("ProcessSale", params) if params is not None else None
                 if res is not None:
                     st.success("ProcessSale invoked. Check Sales and Inventory.")
+                    get_inventory_lookup.clear()
                     audit_log(current_user_id(), st.session_state['app_user']['username'], "PROCESS_SALE", "Sales", "", f"item={sel_item},store={sel_store},qty={qty}")
                     st.rerun()
     else:
         st.info("Ensure Clothing_Items and Stores exist.")
     st.subheader("Recent Sales")
-    df = run_query("SELECT s.sale_id, s.sale_date, st.name as store_name, ci.name as item_name, s.quantity_sold, s.total_amount, s.payment FROM Sales s JOIN Stores st ON st.store_id = s.store_id JOIN Clothing_Items ci ON ci.item_id = s.item_id ORDER BY s.sale_date DESC LIMIT 50")
+    df = concat_chunks(run_query_stream("SELECT s.sale_id, s.sale_date, st.name as store_name, ci.name as item_name, s.quantity_sold, s.total_amount, s.payment FROM Sales s JOIN Stores st ON st.store_id = s.store_id JOIN Clothing_Items ci ON ci.item_id = s.item_id ORDER BY s.sale_date DESC LIMIT 50"))
     if df is None or df.empty:
         st.info("No sales yet.")
     else:
@@ -460,7 +1197,7 @@ elif page == "Sales":
 elif page == "Purchase Orders":
     st.header("Purchase Orders (auto-create from Inventory_Alerts)")
     st.markdown("Auto-create a Purchase Order (PO) for an alert. The app attempts to pick a supplier by looking up fabrics used for that item and choosing the supplier with the lowest cost_per_meter.")
-    alerts = run_query("SELECT * FROM Inventory_Alerts ORDER BY alert_date DESC LIMIT 100")
+    alerts = run_query("SELECT alert_id, item_id, message, alert_date FROM Inventory_Alerts ORDER BY alert_date DESC LIMIT 100")
     st.subheader("Inventory Alerts")
     if alerts is None or alerts.empty:
         st.info("No inventory alerts found.")
@@ -469,21 +1206,11 @@ elif page == "Purchase Orders":
 
     st.subheader("Create PO from an alert")
     if alerts is not None and not alerts.empty:
-        alert_map = dict(zip(alerts['alert_id'], alerts['item_id']))
-        sel_alert = st.selectbox("Select alert", list(alert_map.keys()), format_func=lambda x: f"Alert {x} - item {alert_map[x]}")
+        alert_map = alerts.set_index('alert_id')['item_id']
+        sel_alert = st.selectbox("Select alert", alert_map.index.tolist(), format_func=lambda x: f"Alert {x} - item {alert_map.at[x]}")
         if st.button("Auto-create PO for selected alert"):
-            item_id = alert_map[sel_alert]
-            q_supplier = """
-            SELECT f.supplier_id, s.name AS supplier_name, MIN(f.cost_per_meter) AS min_cost
-            FROM Clothing_Item_Fabrics cif
-            JOIN Fabrics f ON cif.fabric_id = f.fabric_id
-            JOIN Suppliers s ON f.supplier_id = s.supplier_id
-            WHERE cif.item_id = %s
-            GROUP BY f.supplier_id, s.name
-            ORDER BY min_cost ASC
-            LIMIT 1
-            """
-            sup_df = run_query(q_supplier, (item_id,))
+            item_id = int(alert_map.at[sel_alert])
+            sup_df = run_query("SELECT supplier_id FROM v_cheapest_supplier_per_item WHERE item_id = %s", (item_id,))
             if sup_df.empty:
                 st.error("No supplier found for this item (no fabrics mapped). Create fabric mappings first.")
             else:
@@ -496,18 +1223,18 @@ elif page == "Purchase Orders":
                     qty_order = max(10, rq * 2)
                 # robust expected_delivery calculation
                 expected_delivery = (_dt.datetime.now() + _dt.timedelta(days=7)).date()
-                ok = run_modification(
-                    "INSERT INTO Purchase_Orders (item_id, supplier_id, quantity_ordered, expected_delivery, notes) VALUES (%s,%s,%s,%s,%s)",
-                    (item_id, supplier_id, qty_order, expected_delivery, f"Auto PO from alert {sel_alert}")
-                )
-                if ok:
+                # insert the PO and tag the alert in one transaction; LAST_INSERT_ID() is the new po_id
+                ids = run_tx([
+                    ("INSERT INTO Purchase_Orders (item_id, supplier_id, quantity_ordered, expected_delivery, notes) VALUES (%s,%s,%s,%s,%s)",
+                     (item_id, supplier_id, qty_order, expected_delivery, f"Auto PO from alert {sel_alert}")),
+                    ("UPDATE Inventory_Alerts SET message = CONCAT(message, ' | PO_CREATED:', LAST_INSERT_ID()) WHERE alert_id = %s",
+                     (sel_alert,)),
+                ])
+                if ids:
+                    po_id = ids[0]
                     st.success(f"Purchase Order created: item {item_id}, supplier {supplier_id}, qty {qty_order}")
-                    po_df = run_query("SELECT po_id FROM Purchase_Orders ORDER BY created_at DESC LIMIT 1")
-                    if not po_df.empty:
-                        po_id = int(po_df['po_id'].iloc[0])
-                        run_modification("UPDATE Inventory_Alerts SET message = CONCAT(message, ' | PO_CREATED:', %s) WHERE alert_id = %s", (str(po_id), sel_alert))
-                        audit_log(current_user_id(), st.session_state['app_user']['username'], "CREATE_PO", "Purchase_Orders", po_id, f"from alert {sel_alert}, qty={qty_order}, supplier={supplier_id}")
-                        st.rerun()
+                    audit_log(current_user_id(), st.session_state['app_user']['username'], "CREATE_PO", "Purchase_Orders", po_id, f"from alert {sel_alert}, qty={qty_order}, supplier={supplier_id}")
+                    st.rerun()
     else:
         st.info("No alerts to create PO from.")
 
@@ -522,7 +1249,7 @@ elif page == "Purchase Orders":
 elif page == "Suppliers & Fabrics":
     st.header("Suppliers & Fabrics")
 
-    sup = run_query("SELECT * FROM Suppliers")
+    sup = run_query("SELECT supplier_id, name, email, phone, address FROM Suppliers")
     if sup is None or sup.empty:
         st.info("No suppliers yet. Add a supplier below.")
     else:
@@ -540,6 +1267,7 @@ elif page == "Suppliers & Fabrics":
                 ok = run_modification("INSERT INTO Suppliers (name, email, phone, address) VALUES (%s,%s,%s,%s)", (name, email, phone, addr))
                 if ok:
                     st.success("Supplier added.")
+                    get_suppliers_lookup.clear()
                     audit_log(current_user_id(), st.session_state['app_user']['username'], "CREATE_SUPPLIER", "Suppliers", "", f"{name}")
                     st.rerun()
 
@@ -554,11 +1282,11 @@ elif page == "Suppliers & Fabrics":
         with st.form("add_fabric"):
             st.markdown("**Add Fabric**")
             mat = st.text_input("Material")
-            supplier_df = run_query("SELECT supplier_id, name FROM Suppliers")
+            supplier_df = get_suppliers_lookup()
             supplied = None
             if supplier_df is not None and not supplier_df.empty:
-                sup_map = dict(zip(supplier_df['supplier_id'], supplier_df['name']))
-                supplied = st.selectbox("Supplier", list(sup_map.keys()), format_func=lambda x: sup_map[x])
+                sup_map = supplier_df.set_index('supplier_id')['name']
+                supplied = st.selectbox("Supplier", sup_map.index.tolist(), format_func=lambda x: sup_map.at[x])
             else:
                 st.info("Create a supplier first.")
             cost = st.number_input("Cost per meter", min_value=0.0)
@@ -578,7 +1306,7 @@ elif page == "Collections & Designers":
 
     # Designers section
     st.subheader("Designers")
-    designers = run_query("SELECT * FROM Designers")
+    designers = run_query("SELECT designer_id, name, email, phone, style FROM Designers")
     if designers is None or designers.empty:
         st.info("No designers found. Create a new designer below.")
     else:
@@ -596,6 +1324,7 @@ elif page == "Collections & Designers":
                 ok = run_modification("INSERT INTO Designers (name, email, phone, style) VALUES (%s,%s,%s,%s)", (name, email, phone, style))
                 if ok:
                     st.success("Designer added.")
+                    get_designers_lookup.clear()
                     audit_log(current_user_id(), st.session_state['app_user']['username'], "CREATE_DESIGNER", "Designers", "", f"{name}")
                     st.rerun()
 
@@ -614,11 +1343,11 @@ elif page == "Collections & Designers":
             colname = st.text_input("Collection name")
             season = st.text_input("Season")
             year = st.number_input("Year", min_value=2000, max_value=2100, value=_dt.datetime.now().year)
-            designers_df = run_query("SELECT designer_id, name FROM Designers")
+            designers_df = get_designers_lookup()
             designer_choice = None
             if designers_df is not None and not designers_df.empty:
-                dm = dict(zip(designers_df['designer_id'], designers_df['name']))
-                designer_choice = st.selectbox("Designer", list(dm.keys()), format_func=lambda x: dm[x])
+                dm = designers_df.set_index('designer_id')['name']
+                designer_choice = st.selectbox("Designer", dm.index.tolist(), format_func=lambda x: dm.at[x])
             else:
                 st.info("Create a designer first.")
             if st.form_submit_button("Add Collection"):
@@ -628,6 +1357,7 @@ elif page == "Collections & Designers":
                     ok = run_modification("INSERT INTO Collections (name, season, year, designer_id) VALUES (%s,%s,%s,%s)", (colname, season, year, designer_choice))
                     if ok:
                         st.success("Collection added.")
+                        get_collections_lookup.clear()
                         audit_log(current_user_id(), st.session_state['app_user']['username'], "CREATE_COLLECTION", "Collections", "", f"{colname}")
                         st.rerun()
 
@@ -636,12 +1366,12 @@ elif page == "Collections & Designers":
     if designers is None or designers.empty:
         st.info("No designer portfolio to display. Create designers first.")
     else:
-        designer_map = dict(zip(designers['designer_id'], designers['name']))
-        sel = st.selectbox("Select designer to view portfolio", list(designer_map.keys()), format_func=lambda x: designer_map[x])
+        designer_map = designers.set_index('designer_id')['name']
+        sel = st.selectbox("Select designer to view portfolio", designer_map.index.tolist(), format_func=lambda x: designer_map.at[x])
         if sel:
-            d_info = run_query("SELECT * FROM Designers WHERE designer_id=%s", (sel,))
-            d_cols = run_query("SELECT * FROM Collections WHERE designer_id=%s", (sel,))
-            d_items = run_query("SELECT ci.* FROM Clothing_Items ci JOIN Collections c ON ci.collection_id = c.collection_id WHERE c.designer_id = %s", (sel,))
+            d_info = run_query("SELECT designer_id, name, email, phone, style FROM Designers WHERE designer_id=%s", (sel,))
+            d_cols = run_query("SELECT collection_id, name, season, year FROM Collections WHERE designer_id=%s", (sel,))
+            d_items = run_query("SELECT ci.item_id, ci.name, ci.size, ci.color, ci.price, c.name AS collection FROM Clothing_Items ci JOIN Collections c ON ci.collection_id = c.collection_id WHERE c.designer_id = %s", (sel,))
             st.subheader("Designer Info")
             st.dataframe(d_info)
             st.subheader("Collections")
@@ -652,25 +1382,64 @@ elif page == "Collections & Designers":
 # ---------- Alerts & Triggers ----------
 elif page == "Alerts & Triggers":
     st.header("Inventory Alerts & Triggers")
-    alerts = run_query("SELECT * FROM Inventory_Alerts ORDER BY alert_date DESC LIMIT 200")
+    alerts = concat_chunks(run_query_stream("SELECT alert_id, item_id, message, alert_date FROM Inventory_Alerts ORDER BY alert_date DESC LIMIT 200"))
     if alerts is None or alerts.empty:
         st.info("No inventory alerts.")
     else:
         st.dataframe(alerts)
 
     st.subheader("Simulate update to fire reorder trigger")
-    inv = run_query("SELECT inventory_id, item_id, quantity_in_stock, reorder_level FROM Inventory")
+    inv = get_inventory_lookup()
     if inv is not None and not inv.empty:
-        inv_map = dict(zip(inv['inventory_id'], inv['item_id']))
-        choose = st.selectbox("Select inventory row", list(inv_map.keys()))
-        rlevel = int(inv[inv['inventory_id'] == choose]['reorder_level'].iloc[0])
+        choose = st.selectbox("Select inventory row", inv.index.tolist())
+        rlevel = int(inv.at[choose, 'reorder_level'])
         new_qty = st.number_input("Set new quantity (≤ reorder_level to create alert)", value=rlevel, step=1)
         if st.button("Set quantity and trigger alert"):
-            ok = run_modification("UPDATE Inventory SET quantity_in_stock = %s WHERE inventory_id = %s", (new_qty, choose))
-            if ok:
+            # the no-op guard lives in SQL (not the cached frame, which may be stale): a row that
+            # already holds this value is not matched, so nothing is written and no trigger fires
+            changed = run_modification(
+                "UPDATE Inventory SET quantity_in_stock = %s WHERE inventory_id = %s AND NOT (quantity_in_stock <=> %s)",
+                (new_qty, choose, new_qty), return_count=True)
+            if changed == 0:
+                st.info("Stock already at that quantity; nothing was written.")
+                get_inventory_lookup.clear()
+            elif changed:
                 st.success("Inventory updated. Trigger will insert alert if condition met.")
+                get_inventory_lookup.clear()
                 audit_log(current_user_id(), st.session_state['app_user']['username'], "SIMULATE_REORDER_TRIGGER", "Inventory", choose, f"set_qty={new_qty}")
                 st.rerun()
+
+        st.markdown("**Batch update** (edit several quantities, then apply them in one statement)")
+        # outcome of the last apply, carried over the rerun that resets the editor
+        notice = st.session_state.pop("inventory_batch_notice", None)
+        if notice:
+            st.info(notice)
+        with st.form("inventory_batch"):
+            st.data_editor(inv[['item_id', 'quantity_in_stock', 'reorder_level']],
+                           disabled=['item_id', 'reorder_level'], key="inventory_batch_editor")
+            if st.form_submit_button("Apply all changes"):
+                # the editor's own record of touched cells (row position -> new values), so the
+                # choice of rows does not depend on the possibly stale cached quantities
+                edits = st.session_state["inventory_batch_editor"]["edited_rows"]
+                updates = {int(inv.index[int(pos)]): int(row["quantity_in_stock"])
+                           for pos, row in edits.items() if row.get("quantity_in_stock") is not None}
+                if not updates:
+                    st.info("No quantities changed; no update sent.")
+                else:
+                    changed = set_inventory_quantities(updates)
+                    if changed is not None:
+                        get_inventory_lookup.clear()
+                        # drop the pending edits so a refreshed table does not get them re-applied
+                        del st.session_state["inventory_batch_editor"]
+                        # audit only the rows that were really written, not every edited one
+                        for inv_id in changed:
+                            audit_log(current_user_id(), st.session_state['app_user']['username'], "SIMULATE_REORDER_TRIGGER", "Inventory", inv_id, f"set_qty={updates[inv_id]}")
+                        skipped = len(updates) - len(changed)
+                        st.session_state["inventory_batch_notice"] = (
+                            f"Updated {len(changed)} inventory row(s)"
+                            + (f"; {skipped} already held the entered quantity" if skipped else "")
+                            + ". Trigger will insert alerts where stock is at or below reorder level.")
+                        st.rerun()
     else:
         st.info("No inventory rows to simulate.")
 
@@ -678,33 +1447,24 @@ elif page == "Alerts & Triggers":
 elif page == "Procedures & Functions":
     st.header("Call Procedures and Functions")
     st.subheader("GetItemFabricCost")
-    items = run_query("SELECT item_id, name FROM Clothing_Items")
+    items = get_items_lookup()
     if items is None or items.empty:
         st.info("No items found.")
     else:
-        item_map = dict(zip(items['item_id'], items['name']))
-        sel_item = st.selectbox("Item", list(item_map.keys()), format_func=lambda x: item_map[x])
-        if st.button("Compute fabric cost"):
-            val = call_function_sql_scalar("SELECT GetItemFabricCost(%s)", (sel_item,))
-            st.write(f"Fabric cost for '{item_map[sel_item]}': ₹{val}")
+        item_map = items.set_index('item_id')['name']
+        show_fabric_cost(item_map)
 
     st.subheader("GetProfitMargin")
     if items is not None and not items.empty:
-        sel_item2 = st.selectbox("Item for margin", list(item_map.keys()), key="margin_item", format_func=lambda x: item_map[x])
-        if st.button("Compute profit margin"):
-            val = call_function_sql_scalar("SELECT GetProfitMargin(%s)", (sel_item2,))
-            st.write(f"Profit margin for '{item_map[sel_item2]}': {val}%")
+        show_profit_margin(item_map)
 
     st.subheader("GetDesignerRevenue")
-    designers = run_query("SELECT designer_id, name FROM Designers")
+    designers = get_designers_lookup()
     if designers is None or designers.empty:
         st.info("No designers found.")
     else:
-        dmap = dict(zip(designers['designer_id'], designers['name']))
-        sel_d = st.selectbox("Designer", list(dmap.keys()), format_func=lambda x: dmap[x])
-        if st.button("Compute designer revenue"):
-            val = call_function_sql_scalar("SELECT GetDesignerRevenue(%s)", (sel_d,))
-            st.write(f"Revenue for designer '{dmap[sel_d]}': ₹{val}")
+        dmap = designers.set_index('designer_id')['name']
+        show_designer_revenue(dmap)
 
     # ---------------------------------------------------
     # Extra Procedures: GetDesignerPortfolio & MonthlySalesReport
@@ -714,65 +1474,44 @@ elif page == "Procedures & Functions":
 
     # ---- GetDesignerPortfolio ----
     st.markdown("**GetDesignerPortfolio (designer_id)**")
-    designers_df = run_query("SELECT designer_id, name FROM Designers")
-    if designers_df is None or designers_df.empty:
+    if designers is None or designers.empty:
         st.info("No designers found.")
     else:
-        dmap = dict(zip(designers_df['designer_id'], designers_df['name']))
-        sel_d = st.selectbox("Select Designer (for portfolio)", list(dmap.keys()), format_func=lambda x: dmap[x])
-        if st.button("Show Designer Portfolio"):
-            # Call the stored procedure
-            res = call_proc("GetDesignerPortfolio", (sel_d,))
-            if res and len(res) >= 1:
-                st.success(f"Portfolio for Designer: {dmap[sel_d]}")
-                # Procedure may return multiple result sets: Designer info, Collections, Items
-                labels = ["Designer Info", "Collections", "Items"]
-                for i, dfp in enumerate(res):
-                    st.markdown(f"#### {labels[i] if i < len(labels) else f'Result {i+1}'}")
-                    st.dataframe(dfp)
-            else:
-                st.warning("No data returned for this designer.")
+        show_designer_portfolio(dmap)
 
     # ---- MonthlySalesReport ----
     st.markdown("**MonthlySalesReport (store_id, month, year)**")
-    stores_df = run_query("SELECT store_id, name FROM Stores")
+    stores_df = get_stores_lookup()
     if stores_df is None or stores_df.empty:
         st.info("No stores found.")
     else:
-        smap = dict(zip(stores_df['store_id'], stores_df['name']))
-        sel_store = st.selectbox("Select Store", list(smap.keys()), format_func=lambda x: smap[x])
-        col_m, col_y = st.columns(2)
-        month = col_m.number_input("Month (1-12)", min_value=1, max_value=12, value=_dt.datetime.now().month)
-        year = col_y.number_input("Year", min_value=2000, max_value=2100, value=_dt.datetime.now().year)
-        if st.button("Generate Monthly Sales Report"):
-            res = call_proc("MonthlySalesReport", (sel_store, month, year))
-            if res and len(res) >= 1:
-                st.success(f"Monthly Sales Report for {smap[sel_store]} ({month}/{year})")
-                st.dataframe(res[0])
-            else:
-                st.warning("No data found for this period.")
+        smap = stores_df.set_index('store_id')['name']
+        show_monthly_sales_report(smap)
 
 # ---------- Reports ----------
 elif page == "Reports":
     st.header("Reports (Nested / Join / Aggregate queries)")
     st.markdown("Run example queries required by rubric: nested query, join query, aggregate query.")
+    # the chosen report is kept in session_state so paging widgets do not hide it again
     if st.button("Nested: Items more expensive than collection average"):
-        df = run_query("""
-        SELECT ci.item_id, ci.name, ci.price, c.name AS collection_name
-        FROM Clothing_Items ci
-        JOIN Collections c ON ci.collection_id = c.collection_id
-        WHERE ci.price > (
-            SELECT AVG(ci2.price) FROM Clothing_Items ci2 WHERE ci2.collection_id = ci.collection_id
-        ) ORDER BY c.name, ci.price DESC
-        """)
-        if df is None or df.empty:
-            st.info("No results.")
-        else:
-            st.dataframe(df)
-            csv = df.to_csv(index=False).encode('utf-8')
-            st.download_button("Download CSV (Nested)", csv, "nested_items.csv")
+        st.session_state["report"] = "nested"
+    if st.session_state.get("report") == "nested":
+        # per-collection average via a window function: one pass instead of a correlated subquery per row
+        show_paginated_report("nested", """
+        SELECT item_id, name, price, collection_name
+        FROM (
+            SELECT ci.item_id, ci.name, ci.price, c.name AS collection_name,
+                   AVG(ci.price) OVER (PARTITION BY ci.collection_id) AS avg_price
+            FROM Clothing_Items ci
+            JOIN Collections c ON ci.collection_id = c.collection_id
+        ) t
+        WHERE price > avg_price
+        ORDER BY collection_name, price DESC, item_id
+        """, "Download CSV (Nested)", "nested_items.csv")
     if st.button("Join: Full product info (item + designer + supplier)"):
-        df = run_query("""
+        st.session_state["report"] = "join"
+    if st.session_state.get("report") == "join":
+        show_paginated_report("join", """
         SELECT ci.item_id, ci.name AS item_name, ci.price, c.name AS collection_name, d.name AS designer_name, f.material AS fabric, s.name AS supplier
         FROM Clothing_Items ci
         LEFT JOIN Collections c ON ci.collection_id = c.collection_id
@@ -780,18 +1519,14 @@ elif page == "Reports":
         LEFT JOIN Uses u ON ci.item_id = u.item_id
         LEFT JOIN Fabrics f ON u.fabric_id = f.fabric_id
         LEFT JOIN Suppliers s ON f.supplier_id = s.supplier_id
-        """)
-        if df is None or df.empty:
-            st.info("No results.")
-        else:
-            st.dataframe(df)
-            st.download_button("Download CSV (Join)", df.to_csv(index=False).encode('utf-8'), "join_products.csv")
+        ORDER BY ci.item_id, f.fabric_id
+        """, "Download CSV (Join)", "join_products.csv")
     if st.button("Aggregate: Top Selling Items"):
+        # reads the trigger-maintained summary, so cost scales with items rather than sales
         df = run_query("""
-        SELECT ci.item_id, ci.name, IFNULL(SUM(s.quantity_sold),0) AS qty_sold, IFNULL(SUM(s.total_amount),0) AS revenue
+        SELECT ci.item_id, ci.name, IFNULL(s.qty_sold,0) AS qty_sold, IFNULL(s.revenue,0) AS revenue
         FROM Clothing_Items ci
-        LEFT JOIN Sales s ON ci.item_id = s.item_id
-        GROUP BY ci.item_id, ci.name
+        LEFT JOIN item_sales_summary s ON ci.item_id = s.item_id
         ORDER BY qty_sold DESC LIMIT 10
         """)
         if df is None or df.empty:
@@ -809,27 +1544,32 @@ elif page == "Reports":
     # ---- Join Query 1: Complete Product Information ----
     st.markdown("**Join Query 1: Complete Product Information (Item + Designer + Supplier)**")
     if st.button("Run Complete Product Info Query"):
-        q = """
-        SELECT ci.item_id, ci.name AS item_name, ci.price, 
-               c.name AS collection_name, d.name AS designer_name, 
-               f.material AS fabric, s.name AS supplier_name
+        st.session_state["report"] = "product_info"
+    if st.session_state.get("report") == "product_info":
+        # only the chosen columns cross the wire; the joins stay so the row set is unchanged
+        chosen = st.multiselect("Columns", list(PRODUCT_INFO_COLUMNS), default=list(PRODUCT_INFO_COLUMNS), key="product_info_cols")
+        select_list = ", ".join(f"{expr} AS {name}" for name, expr in PRODUCT_INFO_COLUMNS.items() if name in chosen)
+        q = f"""
+        SELECT {select_list}
         FROM Clothing_Items ci
         LEFT JOIN Collections c ON ci.collection_id = c.collection_id
         LEFT JOIN Designers d ON c.designer_id = d.designer_id
         LEFT JOIN Clothing_Item_Fabrics cif ON ci.item_id = cif.item_id
         LEFT JOIN Fabrics f ON cif.fabric_id = f.fabric_id
-        LEFT JOIN Suppliers s ON f.supplier_id = s.supplier_id;
+        LEFT JOIN Suppliers s ON f.supplier_id = s.supplier_id
+        ORDER BY ci.item_id, cif.cf_id
         """
-        df = run_query(q)
-        if df is None or df.empty:
-            st.warning("No data found for this join.")
+        if not chosen:
+            st.info("Pick at least one column.")
         else:
-            st.dataframe(df)
-            st.download_button("Download CSV (Complete Product Info)", df.to_csv(index=False).encode('utf-8'), "complete_product_info.csv")
+            show_paginated_report("product_info", q, "Download CSV (Complete Product Info)", "complete_product_info.csv",
+                                  empty_msg="No data found for this join.", cached=True)
 
     # ---- Join Query 2: Sales Performance by Store ----
     st.markdown("**Join Query 2: Sales Performance by Store with Item Details**")
     if st.button("Run Sales Performance Query"):
+        st.session_state["report"] = "sales_performance"
+    if st.session_state.get("report") == "sales_performance":
         q = """
         SELECT st.name AS store_name, ci.name AS item_name, 
                SUM(s.quantity_sold) AS total_quantity, 
@@ -838,14 +1578,10 @@ elif page == "Reports":
         JOIN Stores st ON s.store_id = st.store_id
         JOIN Clothing_Items ci ON s.item_id = ci.item_id
         GROUP BY st.name, ci.name
-        ORDER BY store_name, total_revenue DESC;
+        ORDER BY store_name, total_revenue DESC, item_name
         """
-        df = run_query(q)
-        if df is None or df.empty:
-            st.warning("No data found for this join.")
-        else:
-            st.dataframe(df)
-            st.download_button("Download CSV (Sales Performance)", df.to_csv(index=False).encode('utf-8'), "sales_performance_by_store.csv")
+        show_paginated_report("sales_performance", q, "Download CSV (Sales Performance)", "sales_performance_by_store.csv",
+                              empty_msg="No data found for this join.")
 
 # ---------- Admin (App Users) ----------
 elif page == "Admin (App Users)":
@@ -877,14 +1613,33 @@ elif page == "Admin (App Users)":
 # ---------- Audit Log ----------
 elif page == "Audit Log":
     st.header("Audit Log (actions performed via GUI)")
-    logs = run_query("SELECT * FROM audit_log ORDER BY created_at DESC LIMIT 500")
+    # keyset pagination on audit_id (monotonic with created_at): each page starts below the last id seen,
+    # so older pages cost an index range scan instead of an OFFSET scan
+    page_size = st.selectbox("Page size", [25, 50, 100], key="audit_page_size")
+    cursors = st.session_state.setdefault("audit_cursors", [None])
+    before = cursors[-1]
+    cols_sql = "SELECT audit_id, created_at, username, action, table_name, row_id, details FROM audit_log"
+    if before is None:
+        logs = concat_chunks(run_query_stream(f"{cols_sql} ORDER BY audit_id DESC LIMIT %s", (page_size,)))
+    else:
+        logs = concat_chunks(run_query_stream(f"{cols_sql} WHERE audit_id < %s ORDER BY audit_id DESC LIMIT %s", (before, page_size)))
     if logs is None or logs.empty:
         st.info("No audit logs yet.")
     else:
         st.dataframe(logs)
-        if st.button("Export audit log to CSV"):
-            csv = logs.to_csv(index=False).encode('utf-8')
-            st.download_button("Download CSV", csv, "audit_log.csv")
+    col_newer, col_page, col_older = st.columns(3)
+    if col_newer.button("◀ Newer", disabled=len(cursors) == 1):
+        cursors.pop()
+        st.rerun()
+    col_page.markdown(f"Page {len(cursors)}")
+    if col_older.button("Older ▶", disabled=logs is None or len(logs) < page_size):
+        cursors.append(int(logs['audit_id'].iloc[-1]))
+        st.rerun()
+    if not logs.empty:
+        # full log, written from the cursor straight into CSV when the button is clicked
+        st.download_button("Export audit log to CSV",
+                           lambda: download_query_as_csv(f"{cols_sql} ORDER BY audit_id DESC"),
+                           "audit_log.csv")
 
 # ---------- SQL Runner ----------
 elif page == "SQL Runner":
@@ -892,11 +1647,12 @@ elif page == "SQL Runner":
     st.markdown("Use for read-only testing. Only SELECT queries are allowed from GUI.")
     q = st.text_area("Write SELECT query here (read-only):", height=200)
     if st.button("Run SELECT"):
-        q_trim = q.strip().lower()
-        if not q_trim.startswith("select"):
+        if not is_read_only_sql(q):
             st.error("Only SELECT queries are allowed.")
         else:
-            df = run_query(q)
+            # is_read_only_sql screens the text (incl. INTO OUTFILE/DUMPFILE); the READ ONLY
+            # transaction then makes the server reject any table write that slips through
+            df = run_query(q, read_only=True)
             if df is None or df.empty:
                 st.info("No results.")
             else:
@@ -3,7 +3,8 @@
 # It reads DB creds from .env and creates an app user with hashed password + salt.
 
 import os
-import binascii, hashlib
+import hashlib
+import secrets
 from dotenv import load_dotenv
 import mysql.connector
 
@@ -18,10 +19,15 @@ DB_CONFIG = {
 }
 
 def make_salt():
-    return binascii.hexlify(os.urandom(16)).decode()
+    return secrets.token_hex(16)
 
-def hash_password(password, salt):
-    return hashlib.sha256((salt + password).encode()).hexdigest()
+SCRYPT_N, SCRYPT_R, SCRYPT_P = 2**15, 8, 1
+SCRYPT_MAXMEM = 64 * 1024 * 1024
+
+def hash_password(password, salt, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P):
+    # must match hash_password in Hand.py
+    dk = hashlib.scrypt(password.encode(), salt=bytes.fromhex(salt), n=n, r=r, p=p, maxmem=SCRYPT_MAXMEM, dklen=32)
+    return f"scrypt${n}${r}${p}${dk.hex()}"
 
 def create_admin(username, password):
     salt = make_salt()